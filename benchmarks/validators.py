@@ -0,0 +1,162 @@
+"""Benchmarks of credential validation (`auth.validators`) against the previous validators
+(also checks that username/email constraints accept the same inputs as before)
+
+Usage (from the repository root, with requirements installed):
+    python benchmarks/validators.py
+"""
+import os
+import re
+import sys
+import tempfile
+from hashlib import sha1
+from timeit import repeat
+from string import ascii_lowercase,ascii_uppercase,digits,punctuation
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+for key,value in {
+    "REDIS_URL": "redis://localhost:6379",
+    "REDIS_KEY_TTL": "3600",
+    "ACCOUNTS_SERVICE_API_KEY": "",
+    "ACCOUNTS_SERVICE_BASE_URL": "http://localhost:8002",
+}.items():
+    os.environ.setdefault(key, value)
+
+from pydantic import BaseModel,TypeAdapter,ValidationError,validator
+
+from schemas import Signup
+from auth.validators import Username,Email,PasswordPolicy,BreachedPasswords,CHARACTER_CLASSES,validate_many
+
+
+
+
+# Previous implementation, copied exactly from before the validation engine.
+# Its password validators call `ValidationError("...")`, which raises TypeError under
+# pydantic v2 for invalid passwords; the benchmarks only use valid passwords.
+def _legacy_password_length_validator(password):
+    if len(password) < 8:
+        raise ValidationError("Password length is too low. minimum is 8")
+def _legacy_password_characters_validator(password):
+    char_groups = [ascii_uppercase,ascii_lowercase,digits,punctuation]
+    condition_dict = {group:False for group in char_groups}
+    for char in password:
+        for char_group in char_groups:
+            if char in char_group:
+                condition_dict[char_group] = True
+                break
+    if not all(condition_dict.values()):
+        raise ValidationError(
+            "Password must contain one lower case, one upper case, one digit and one punctuation"
+        )
+def _legacy_password_validator(raw_password:str):
+    return _legacy_password_length_validator(raw_password) # and _password_characters_validator(raw_password)
+
+
+def _legacy_username_validator(username:str):
+    assert len(username) >= 5, "Username must be at least 5 characters"
+    assert re.fullmatch(r"\w+", username), "Username must contain only letters, digits and unserscore"
+
+
+class LegacySignup(BaseModel):
+    username: str
+    password: str
+    email: str
+
+    @validator("username")
+    def validate_username(cls, value):
+        _legacy_username_validator(value)
+        return value
+
+    @validator("password")
+    def validate_password(cls, value):
+        _legacy_password_validator(value)
+        return value
+
+    @validator("email")
+    def email_validator(cls, value):
+        assert re.fullmatch(r'\w+@\w+\.\w+', value)  # [a-zA-Z]+[a-zA-Z0-9_\.\-]*@[\w]{2,}\.[a-zA-Z]{2,}
+        return value
+
+
+
+
+def _legacy_accepts(pattern, value) -> bool:
+    return re.fullmatch(pattern, value) is not None
+
+def _accepts(adapter, value) -> bool:
+    try:
+        adapter.validate_python(value)
+        return True
+    except ValidationError:
+        return False
+
+
+def check_compatibility():
+    """Checks that username/email constraints accept and reject the same inputs as before
+    (pydantic-core uses rust `regex` whose unicode `\w` is wider than python's)
+    """
+    username_adapter, email_adapter = TypeAdapter(Username), TypeAdapter(Email)
+    usernames = [
+        "ramin_rx7", "user_1", "کاربر_۱", "Ünïcödé", "user1²", "user-1", "user 1", "user.1",
+        "user\u200d1", "use\u0301r1", "user\u203f1", "user\u200b1", "user\u00a01",
+    ]
+    for username in usernames:
+        expected = len(username) >= 5 and _legacy_accepts(r"\w+", username)
+        assert _accepts(username_adapter, username) == expected, f"username {username!r}"
+    emails = [
+        "ramin@example.com", "کاربر@مثال.com", "a@b.c", "a.b@c.d", "a@b", "us\u200der@b.c",
+        "use\u0301r@b.c", "user@b\u203fc.d", "user@b.c\u0301",
+    ]
+    for email in emails:
+        expected = _legacy_accepts(r'\w+@\w+\.\w+', email)
+        assert _accepts(email_adapter, email) == expected, f"email {email!r}"
+
+
+
+
+def _legacy_validate(record):
+    try:
+        return LegacySignup(**record)
+    except ValidationError as e:
+        return e
+
+
+def bench(name, old, new, number):
+    old_time = min(repeat(old, number=number, repeat=5)) / number * 1e6
+    new_time = min(repeat(new, number=number, repeat=5)) / number * 1e6
+    print(f"{name:<32} {old_time:>10.2f}us {new_time:>10.2f}us {old_time/new_time:>8.2f}x")
+
+
+def main():
+    check_compatibility()
+
+    password = "correcthorsebatterystaple-Staple1"
+    record = {"username": "ramin_rx7", "password": password, "email": "ramin@example.com"}
+    records = [{**record, "username": f"user_{i}"} for i in range(1000)]
+    mixed_records = [*records[:-1], {**record, "username": "bad"}]
+    policy = PasswordPolicy(8, CHARACTER_CLASSES)
+    username_adapter = TypeAdapter(Username)
+
+    print(f"{'':<32} {'previous':>12} {'current':>12} {'speedup':>9}")
+    bench("password character classes",
+          lambda: _legacy_password_characters_validator(password), lambda: policy(password), 20000)
+    bench("username",
+          lambda: _legacy_username_validator("ramin_rx7"), lambda: username_adapter.validate_python("ramin_rx7"), 20000)
+    bench("Signup model",
+          lambda: LegacySignup(**record), lambda: Signup(**record), 20000)
+    bench("1000 Signup records (batch)",
+          lambda: [LegacySignup(**item) for item in records], lambda: validate_many(Signup, records), 20)
+    bench("1000 Signup records, 1 invalid",
+          lambda: [_legacy_validate(item) for item in mixed_records], lambda: validate_many(Signup, mixed_records), 20)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "breached.bin")
+        BreachedPasswords.build(path, sorted(sha1(f"password{i}".encode()).hexdigest() for i in range(1_000_000)))
+        breached = BreachedPasswords(path)
+        number = 20000
+        hit = min(repeat(lambda: "password500000" in breached, number=number, repeat=5)) / number * 1e6
+        miss = min(repeat(lambda: password in breached, number=number, repeat=5)) / number * 1e6
+        print(f"breached lookup (1M hashes): hit {hit:.2f}us, miss {miss:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from fastapi import APIRouter,Header,Depends,HTTPException
+from fastapi.responses import FileResponse
+
+from auth.jwt_auth.exceptions import PermissionDenied
+from profiling import profile_store,is_debug_token,ProfilerMiddleware
+
+
+
+
+def debug_token_required(token:str=Header(None, alias=ProfilerMiddleware.trigger_header.decode())):
+    if not is_debug_token(token):
+        raise PermissionDenied("Invalid debug token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(debug_token_required)])
+
+
+
+
+@router.get("/profiles/")
+async def profiles():
+    """(requires `X-Profile: <PROFILER_DEBUG_TOKEN>` header) list of stored request profiles (newest first)
+
+    Returns:
+    --------
+    `dict[str, list[str]]`: profile ids which can be retrieved from `/admin/profiles/<id>`
+    """
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}")
+async def profile(profile_id:str):
+    """(requires `X-Profile: <PROFILER_DEBUG_TOKEN>` header) download a stored profile (speedscope json file)
+
+    Args:
+    -----
+    - profile_id `(str)`: _value of `X-Profile-Id` header of the profiled response_
+
+    Returns:
+    --------
+    `FileResponse`: speedscope file which can be opened in https://www.speedscope.app
+    """
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(path, media_type="application/json", filename=profile_id)
@@ -1,8 +1,15 @@
 from uuid import uuid4
+from time import time
+from enum import IntEnum
+from binascii import Error as BinasciiError
+from base64 import urlsafe_b64encode,urlsafe_b64decode
 from datetime import timedelta,datetime
 
 import jwt
 
+from config import SETTINGS
+from profiling import traced
+
 
 
 SECRET_KEY = ""
@@ -11,15 +18,97 @@ _access_token_expiry = timedelta(seconds=60*60*24) # one day in seconds
 ACCESS_TOKEN_EXPIRY = datetime.utcnow() + _access_token_expiry
 REFRESH_TOKEN_EXPIRY = datetime.utcnow() + _access_token_expiry*5
 
+# Compact payload format (claims: v, typ, sub|uid, jti, iat, exp)
+# generation is enabled by `JWT_COMPACT_PAYLOAD` setting, decoding always accepts both formats
+PAYLOAD_VERSION = 1
+_PACKED_IDENTIFIER_SIZE = 12   # ObjectId
+_ACCESS_TOKEN_LIFETIME = int(_access_token_expiry.total_seconds())
+_REFRESH_TOKEN_LIFETIME = _ACCESS_TOKEN_LIFETIME * 5
+
+
+
+class TokenType(IntEnum):
+    ACCESS = 1
+    REFRESH = 2
 
 
 
+
+@traced("decode_jwt")
 def decode_jwt(token): # jwt.exceptions.DecodeError
-    return jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    """Decodes the token and returns its payload (compact payloads are expanded to the legacy claim names)
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    if "v" in payload:
+        return _expand_compact_payload(payload)
+    return payload
+
+
+
+def _b64encode(data:bytes) -> str:
+    return urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data:str) -> bytes:
+    return urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _pack_identifier(identifier) -> dict:
+    if SETTINGS.JWT_PACK_IDENTIFIER and len(identifier) == _PACKED_IDENTIFIER_SIZE*2:
+        try:
+            packed = bytes.fromhex(identifier)
+        except ValueError:
+            packed = None
+        # only lowercase hex round-trips (identifier is used as-is in redis keys)
+        if (packed is not None) and (packed.hex() == identifier):
+            return {"uid": _b64encode(packed)}
+    return {"sub": identifier}
+
+
+def _expand_compact_payload(payload:dict) -> dict:
+    """Converts compact claims (`typ`, `sub`/`uid`) back to legacy ones (`token_type`, `user_identifier`)
+
+    `jti` is kept as is since it's used (in the same form) as redis key.
+
+    Raises:
+    -------
+    jwt.DecodeError: _When payload version is unknown or claims are malformed_
+    """
+    payload = dict(payload)
+    version = payload.pop("v")
+    if (type(version) is not int) or (version != PAYLOAD_VERSION):
+        raise jwt.DecodeError(f"Unsupported payload version: {version!r}")
+    try:
+        token_type = payload.pop("typ")
+        if type(token_type) is not int:
+            raise TypeError(token_type)
+        token_type = TokenType(token_type)
+        if "uid" in payload:
+            packed = _b64decode(payload.pop("uid"))
+            if len(packed) != _PACKED_IDENTIFIER_SIZE:
+                raise ValueError(packed)
+            identifier = packed.hex()
+        else:
+            identifier = payload.pop("sub")
+            if type(identifier) is not str:
+                raise TypeError(identifier)
+    except (KeyError, ValueError, TypeError, BinasciiError):
+        raise jwt.DecodeError("Malformed compact payload") from None
+    return {
+        "token_type": token_type.name.lower(),
+        "user_identifier": identifier,
+        **payload
+    }
 
 
 
 def _generate_payload(identifier):
+    if SETTINGS.JWT_COMPACT_PAYLOAD:
+        return {
+            "v": PAYLOAD_VERSION,
+            **_pack_identifier(identifier),
+            "iat": int(time()),
+            "jti": _b64encode(uuid4().bytes),
+        }
     return {
         'user_identifier': identifier,
         'iat': datetime.utcnow(),
@@ -27,6 +116,12 @@ def _generate_payload(identifier):
     }
 
 def _generate_refresh_token(base_payload):
+    if "v" in base_payload:
+        return {
+            "typ": int(TokenType.REFRESH),
+            "exp": base_payload["iat"] + _REFRESH_TOKEN_LIFETIME,
+            **base_payload
+        }
     return {
         "token_type":"refresh",
         "exp":REFRESH_TOKEN_EXPIRY,
@@ -34,6 +129,12 @@ def _generate_refresh_token(base_payload):
     }
 
 def _generate_access_token(base_payload):
+    if "v" in base_payload:
+        return {
+            "typ": int(TokenType.ACCESS),
+            "exp": base_payload["iat"] + _ACCESS_TOKEN_LIFETIME,
+            **base_payload
+        }
     return {
         "token_type":"access",
         "exp":ACCESS_TOKEN_EXPIRY,
@@ -48,5 +149,6 @@ def generate_tokens(identifier) -> tuple[str,str,str]:
     return (base_payload["jti"], encode_payload(access_payload), encode_payload(refresh_payload))
 
 
+@traced("encode_payload")
 def encode_payload(payload):
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
@@ -1,30 +1,251 @@
+import os
 import re
-from string import ascii_lowercase,ascii_uppercase,digits,punctuation
+import mmap
+import tempfile
+from hashlib import sha1
+from functools import cache
+from string import punctuation
+from typing import Annotated,Iterable
 
-from pydantic import ValidationError
+from pydantic import BaseModel,TypeAdapter,ValidationError,StringConstraints,AfterValidator
 
+from config import SETTINGS
 
 
 
-def _password_length_validator(password):
-    if len(password) < 8:
-        raise ValidationError("Password length is too low. minimum is 8")
-def _password_characters_validator(password):
-    char_groups = [ascii_uppercase,ascii_lowercase,digits,punctuation]
-    condition_dict = {group:False for group in char_groups}
-    for char in password:
-        for char_group in char_groups:
-            if char in char_group:
-                condition_dict[char_group] = True
-                break
-    if not all(condition_dict.values()):
-        raise ValidationError(
-            "Password must contain one lower case, one upper case, one digit and one punctuation"
-        )
-def password_validator(raw_password:str):
-    return _password_length_validator(raw_password) # and _password_characters_validator(raw_password)
 
+# Declarative constraints (checked by pydantic-core, no python call per value)
+# NOTE: errors are pydantic's generic messages (e.g. "String should match pattern '...'")
+# patterns run on rust `regex`, whose unicode `\w` also matches marks, joiners and connector
+# punctuation; `[\p{L}\p{N}_]` is what python's `\w` (previous validators) accepts.
+USERNAME_MIN_LENGTH = 5
+_WORD = r"[\p{L}\p{N}_]"
+USERNAME_PATTERN = rf"^{_WORD}+$"
+EMAIL_PATTERN = rf"^{_WORD}+@{_WORD}+\.{_WORD}+$"  # [a-zA-Z]+[a-zA-Z0-9_\.\-]*@[\w]{2,}\.[a-zA-Z]{2,}
 
-def username_validator(username:str):
-    assert len(username) >= 5, "Username must be at least 5 characters"
-    assert re.fullmatch(r"\w+", username), "Username must contain only letters, digits and unserscore"
+Username = Annotated[str, StringConstraints(min_length=USERNAME_MIN_LENGTH, pattern=USERNAME_PATTERN)]
+Email = Annotated[str, StringConstraints(pattern=EMAIL_PATTERN)]
+
+
+CHARACTER_CLASSES = {
+    "uppercase": re.compile(r"[A-Z]"),
+    "lowercase": re.compile(r"[a-z]"),
+    "digit": re.compile(r"[0-9]"),
+    "punctuation": re.compile(f"[{re.escape(punctuation)}]"),
+}
+
+
+
+
+class BreachedPasswords:
+    """Breached passwords lookup on a memory-mapped file of sorted raw SHA-1 digests (20 bytes each)
+
+    Lookups are a binary search on the mapped file, so the list is never loaded into memory.
+    The file is mapped once: after it is rebuilt, running processes keep using the old
+    mapping (old contents) until they create a new instance (e.g. on restart).
+
+    Usage:
+    ------
+    ```python
+    BreachedPasswords.build("breached.bin", hibp_lines)  # "<SHA1 HEX>[:count]" lines
+    breached = BreachedPasswords("breached.bin")
+    "123456" in breached  # True
+    ```
+    """
+    digest_size = 20
+
+    def __init__(self, path:str):
+        self.path = path
+        with open(path, "rb") as file:
+            size = self._size(file)
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = size // self.digest_size
+
+    def __contains__(self, password:str) -> bool:
+        digest = sha1(password.encode()).digest()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * self.digest_size
+            current = self._map[offset:offset+self.digest_size]
+            if current == digest:
+                return True
+            if current < digest:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _size(file) -> int:
+        file.seek(0, 2)
+        return file.tell()
+
+    @staticmethod
+    def _file_mode(path:str) -> int:
+        """Mode of the existing file, or default mode of new files (mkstemp creates them with 0600)
+        """
+        try:
+            return os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    @classmethod
+    def build(cls, path:str, hex_digests:Iterable[str], presorted:bool=True):
+        """Writes the lookup file from SHA-1 hex digests (e.g. "Have I Been Pwned" `<HASH>:<COUNT>` lines)
+
+        The file is written next to `path` and then atomically replaced, so mapped instances
+        of the previous file stay valid (they keep seeing the previous contents). Permissions
+        of the previous file are kept.
+
+        Args:
+        -----
+        - path `(str)`: _path of the file to write_
+        - hex_digests `(Iterable[str])`: _SHA-1 hex digests (anything after ":" is ignored)_
+        - presorted `(bool)`: _digests are already sorted (e.g. HIBP "ordered by hash" file),
+          they are streamed to the file and duplicates are skipped. Otherwise they are sorted
+          in memory, which is only suitable for small lists_
+
+        Raises:
+        -------
+        ValueError: _When `presorted` digests are not in ascending order_
+        """
+        digests = (bytes.fromhex(line.split(":", 1)[0].strip()) for line in hex_digests if line.strip())
+        if not presorted:
+            digests = iter(sorted(set(digests)))
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".breached-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                previous = b""
+                for digest in digests:
+                    if len(digest) != cls.digest_size:
+                        raise ValueError(f"Invalid SHA-1 digest: {digest.hex()}")
+                    if digest == previous:
+                        continue
+                    if digest < previous:
+                        raise ValueError(f"Digests are not sorted ({digest.hex()} after {previous.hex()})")
+                    file.write(digest)
+                    previous = digest
+            os.chmod(temp_path, cls._file_mode(path))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+
+class PasswordPolicy:
+    """Configurable password policy
+
+    Args:
+    -----
+    - min_length `(int)`: _minimum length of the password_
+    - character_classes `(Iterable[str])`: _names of `CHARACTER_CLASSES` which must appear in the password_
+    - breached `(BreachedPasswords|None)`: _passwords which are not accepted_
+
+    Raises:
+    -------
+    ValueError: (when validating) if password does not satisfy the policy
+    """
+    def __init__(self, min_length:int=8, character_classes:Iterable[str]=(), breached:BreachedPasswords|None=None):
+        self.min_length = min_length
+        unknown = [name for name in character_classes if name not in CHARACTER_CLASSES]
+        if unknown:
+            raise ValueError(
+                f"Unknown password character classes: {', '.join(unknown)} "
+                f"(allowed: {', '.join(CHARACTER_CLASSES)})"
+            )
+        self.character_classes = [(name, CHARACTER_CLASSES[name]) for name in character_classes]
+        self.breached = breached
+
+    def validate(self, password:str) -> str:
+        if len(password) < self.min_length:
+            raise ValueError(f"Password length is too low. minimum is {self.min_length}")
+        missing = [name for name,pattern in self.character_classes if not pattern.search(password)]
+        if missing:
+            raise ValueError(f"Password must contain at least one character of: {', '.join(missing)}")
+        if (self.breached is not None) and (password in self.breached):
+            raise ValueError("Password has appeared in a data breach, choose another one")
+        return password
+    __call__ = validate
+
+
+password_policy = PasswordPolicy(
+    SETTINGS.PASSWORD_MIN_LENGTH,
+    [name.strip() for name in SETTINGS.PASSWORD_CHARACTER_CLASSES.split(",") if name.strip()],
+    BreachedPasswords(SETTINGS.PASSWORD_BREACHED_HASHES_FILE) if SETTINGS.PASSWORD_BREACHED_HASHES_FILE else None,
+)
+
+
+def password_validator(raw_password:str) -> str:
+    return password_policy.validate(raw_password)
+
+Password = Annotated[str, AfterValidator(password_validator)]
+
+
+
+
+@cache
+def _list_adapter(model:type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def _record_error(model:type[BaseModel], record:dict, errors:list[dict]) -> ValidationError:
+    """Builds validation error of a single record from the errors of the list validation
+    """
+    line_errors = [
+        {"type": error["type"], "loc": error["loc"][1:], "input": error["input"], **({"ctx": error["ctx"]} if "ctx" in error else {})}
+        for error in errors
+    ]
+    try:
+        return ValidationError.from_exception_data(model.__name__, line_errors)
+    except (KeyError, TypeError):   # error types which can not be rebuilt (e.g. custom ones)
+        try:
+            model.model_validate(record)
+        except ValidationError as e:
+            return e
+        raise
+
+
+def _validate_chunk(model:type[BaseModel], records:list[dict]) -> list[BaseModel|ValidationError]:
+    adapter = _list_adapter(model)
+    try:
+        return adapter.validate_python(records)
+    except ValidationError as e:
+        errors = {}
+        for error in e.errors():
+            errors.setdefault(error["loc"][0], []).append(error)
+    valid_indexes = [index for index in range(len(records)) if index not in errors]
+    results = dict(zip(valid_indexes, adapter.validate_python([records[index] for index in valid_indexes])))
+    for index, record_errors in errors.items():
+        results[index] = _record_error(model, records[index], record_errors)
+    return [results[index] for index in range(len(records))]
+
+
+def validate_many(model:type[BaseModel], records:list[dict], chunk_size:int=64) -> list[BaseModel|ValidationError]:
+    """Validates many records at once
+
+    Records are validated in chunks, each chunk in a single pydantic-core call. If a chunk
+    has invalid records, their errors are taken from that call (grouped by record index)
+    and only the valid records of that chunk are validated again to build their models.
+
+    Args:
+    -----
+    - model `(type[BaseModel])`: _pydantic model of the records (e.g. `Signup`)_
+    - records `(list[dict])`: _raw records_
+    - chunk_size `(int)`: _number of records validated per call (bounds the re-validation cost)_
+
+    Returns:
+    --------
+    `list[BaseModel|ValidationError]`: validated model or validation error of each record (same order)
+    """
+    results = []
+    for start in range(0, len(records), chunk_size):
+        results.extend(_validate_chunk(model, records[start:start+chunk_size]))
+    return results
@@ -9,6 +9,20 @@ class _Settings(BaseSettings):
     REDIS_URL : str
     REDIS_KEY_TTL : int
 
+    JWT_COMPACT_PAYLOAD : bool = False   # enable once every consumer decodes compact tokens
+    JWT_PACK_IDENTIFIER : bool = True
+
+    PROFILER_SAMPLE_RATE : float = 0.0
+    PROFILER_DEBUG_TOKEN : str = ""
+    PROFILER_INTERVAL : float = 0.001
+    PROFILER_MAX_ACTIVE : int = 1
+    PROFILER_DIR : str = "/tmp/authorization-profiles"
+    PROFILER_MAX_FILES : int = 50
+
+    PASSWORD_MIN_LENGTH : int = 8
+    PASSWORD_CHARACTER_CLASSES : str = ""   # comma separated: uppercase,lowercase,digit,punctuation
+    PASSWORD_BREACHED_HASHES_FILE : str = ""
+
     class Config:
         # env_file = ".env"
         extra = "ignore"
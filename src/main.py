@@ -3,12 +3,15 @@ from fastapi import FastAPI
 from config import SETTINGS
 
 from api import router
+from profiling import ProfilerMiddleware
 
 
 
 
 app = FastAPI()
 
+app.add_middleware(ProfilerMiddleware)
+
 app.include_router(router)
 
 @app.get("/")
@@ -0,0 +1,3 @@
+from .profiler import RequestProfile,traced
+from .storage import ProfileStore,profile_store
+from .middleware import ProfilerMiddleware,is_debug_token
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from random import random
+from hmac import compare_digest
+
+from config import SETTINGS
+from .profiler import RequestProfile
+from .storage import ProfileStore,profile_store
+
+
+logger = logging.getLogger(__name__)
+
+
+
+def is_debug_token(token:str|bytes|None) -> bool:
+    """Checks the given token against `PROFILER_DEBUG_TOKEN` (always False when it's not set)
+    """
+    expected = SETTINGS.PROFILER_DEBUG_TOKEN
+    if not (expected and token):
+        return False
+    if isinstance(token, str):
+        token = token.encode()
+    return compare_digest(token, expected.encode())
+
+
+
+class ProfilerMiddleware:
+    """ASGI middleware which profiles a sampled fraction of requests (`PROFILER_SAMPLE_RATE`)
+    and requests having `X-Profile: <PROFILER_DEBUG_TOKEN>` header.
+
+    At most `PROFILER_MAX_ACTIVE` requests are profiled at the same time (each one runs a
+    sampler thread competing for the GIL), others are served without profiling.
+
+    Profiled responses get an `X-Profile-Id` header which is the name of the saved
+    profile (retrievable through `/admin/profiles/<id>` with the same `X-Profile` header).
+    Other requests only pay for a random number and a header lookup.
+    Profiles which can not be saved (e.g. unwritable `PROFILER_DIR`) are logged and dropped.
+
+    Usage:
+    ------
+    ```python
+    app.add_middleware(ProfilerMiddleware)
+    ```
+    """
+    trigger_header = b"x-profile"
+    id_header = b"x-profile-id"
+
+    def __init__(self, app, sample_rate:float=None, interval:float=None, max_active:int=None, store:ProfileStore=None):
+        self.app = app
+        self.sample_rate = SETTINGS.PROFILER_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.interval = interval or SETTINGS.PROFILER_INTERVAL
+        self.max_active = SETTINGS.PROFILER_MAX_ACTIVE if max_active is None else max_active
+        self.store = store or profile_store
+        self._active = 0   # only accessed from the event loop thread
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            return await self.app(scope, receive, send)
+
+        name = self.store.new_name()
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = [*message.get("headers", []), (self.id_header, name.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self._active += 1
+        try:
+            profile = RequestProfile(f'{scope["method"]} {scope["path"]}', self.interval)
+            profile.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.stop()
+                try:
+                    await asyncio.to_thread(self.store.save, name, profile.to_speedscope())
+                except OSError:
+                    logger.exception("Could not save profile %s of %s", name, profile.name)
+        finally:
+            self._active -= 1
+
+    def _should_profile(self, scope) -> bool:
+        if self._active >= self.max_active:
+            return False
+        if self.sample_rate and random() < self.sample_rate:
+            return True
+        if SETTINGS.PROFILER_DEBUG_TOKEN:
+            for key,value in scope["headers"]:
+                if key == self.trigger_header:
+                    return is_debug_token(value)
+        return False
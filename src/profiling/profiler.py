@@ -0,0 +1,190 @@
+import sys
+import asyncio
+import threading
+from time import perf_counter
+from functools import wraps
+from inspect import iscoroutinefunction
+from contextvars import ContextVar
+
+
+
+_current_profile : ContextVar["RequestProfile | None"] = ContextVar("current_profile", default=None)
+
+_IDLE_FRAME = ("<event loop idle (awaiting I/O)>", "", 0)
+_OTHER_TASK_FRAME = ("<other tasks>", "", 0)
+
+
+
+
+class RequestProfile:
+    """Sampling profile and traced spans of a single request
+
+    A background thread samples the stack of the event loop thread every `interval` seconds.
+    Samples are only attributed to the request when its own task is the one running,
+    otherwise they are recorded as idle/other tasks so the wall time still adds up.
+
+    Usage:
+    ------
+    ```python
+    profile = RequestProfile("POST /v1/login/")
+    profile.start()
+    try:
+        await app(scope, receive, send)
+    finally:
+        profile.stop()
+    data = profile.to_speedscope()
+    ```
+    """
+    def __init__(self, name:str, interval:float=0.001):
+        self.name = name
+        self.interval = interval
+        self.samples : list[tuple[tuple, float]] = []   # (stack (root -> leaf), weight in seconds)
+        self.spans : list[tuple[str, float, float]] = []   # (name, start, end)
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Starts sampling (must be called inside the task that handles the request)
+        """
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._thread_id = threading.get_ident()
+        self._context_token = _current_profile.set(self)
+        self.start_time = perf_counter()
+        self._thread = threading.Thread(target=self._sample, name=f"profiler: {self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.end_time = perf_counter()
+        _current_profile.reset(self._context_token)
+        self._stop_event.set()
+        self._thread.join()
+
+    def _sample(self):
+        last = self.start_time
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            task = asyncio.current_task(self._loop)
+            now = perf_counter()
+            if task is None:
+                stack = (_IDLE_FRAME,)
+            elif task is not self._task:
+                stack = (_OTHER_TASK_FRAME,)
+            else:
+                stack = _frame_stack(frame)
+            self.samples.append((stack, now - last))
+            last = now
+
+    def to_speedscope(self) -> dict:
+        """Exports the profile in speedscope file format (https://www.speedscope.app)
+
+        Returns:
+        --------
+        `dict`: _a "sampled" profile of the stacks and an "evented" profile of the traced spans_
+        """
+        frames = []
+        frame_indexes = {}
+        def index(frame):
+            if frame not in frame_indexes:
+                frame_indexes[frame] = len(frames)
+                name, file, line = frame
+                frames.append({"name": name, "file": file, "line": line})
+            return frame_indexes[frame]
+
+        duration = self.end_time - self.start_time
+        samples = [[index(frame) for frame in stack] for stack,_ in self.samples]
+        events = []
+        for name, start, end in self.spans:
+            frame = index((name, "", 0))
+            events.append((end - self.start_time, 0, {"type": "C", "frame": frame}))
+            events.append((start - self.start_time, 1, {"type": "O", "frame": frame}))
+        events.sort(key=lambda event: event[:2])
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "RSS-MS-Authorization profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{self.name} (samples)",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": duration,
+                    "samples": samples,
+                    "weights": [weight for _,weight in self.samples],
+                },
+                {
+                    "type": "evented",
+                    "name": f"{self.name} (awaits)",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": duration,
+                    "events": [{**event, "at": at} for at,_,event in events],
+                },
+            ],
+        }
+
+
+
+def _frame_stack(frame) -> tuple:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+
+def _active_profile() -> RequestProfile|None:
+    """Returns profile of the current request if the call is made by the profiled task itself
+
+    Child tasks (`asyncio.gather`, `create_task`) inherit the context variable, but their spans
+    may overlap with each other, which speedscope "evented" profiles can not represent.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return None
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:   # called from a thread without running loop
+        return None
+    return profile if task is profile._task else None
+
+
+def traced(name:str):
+    """Decorator to record the duration of each call as a span of the current request profile.
+
+    Does nothing more than a context variable lookup when the request is not being profiled.
+    Only calls made by the profiled task itself are recorded (so spans are always nested).
+
+    Args:
+    -----
+    - name `(str)`: _name of the span (e.g. "redis.get")_
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                profile = _active_profile()
+                if profile is None:
+                    return await func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    profile.spans.append((name, start, perf_counter()))
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                profile = _active_profile()
+                if profile is None:
+                    return func(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.spans.append((name, start, perf_counter()))
+        return wrapper
+    return decorator
@@ -0,0 +1,54 @@
+import os
+import json
+from time import time_ns
+from uuid import uuid4
+from pathlib import Path
+
+from config import SETTINGS
+
+
+
+class ProfileStore:
+    """Bounded on-disk ring of speedscope profile files
+
+    Files are named `<time_ns>-<random>.speedscope.json` so sorting them by name sorts
+    them by creation time; oldest files are removed when there are more than `max_files`.
+    """
+    suffix = ".speedscope.json"
+
+    def __init__(self, directory:str=None, max_files:int=None):
+        self.directory = Path(directory or SETTINGS.PROFILER_DIR)
+        self.max_files = max_files or SETTINGS.PROFILER_MAX_FILES
+
+    def new_name(self) -> str:
+        return f"{time_ns()}-{uuid4().hex[:8]}{self.suffix}"
+
+    def save(self, name:str, data:dict):
+        """Writes the profile and removes the oldest ones exceeding `max_files` (blocking I/O)
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / name, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+        for old_name in self.list()[self.max_files:]:
+            try:
+                os.remove(self.directory / old_name)
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> list[str]:
+        """Returns names of the stored profiles (newest first)
+        """
+        if not self.directory.is_dir():
+            return []
+        names = [name for name in os.listdir(self.directory) if name.endswith(self.suffix)]
+        return sorted(names, reverse=True)
+
+    def path(self, name:str) -> Path|None:
+        """Returns path of the profile with given name (None if it does not exist)
+        """
+        if name not in self.list():
+            return None
+        return self.directory / name
+
+
+profile_store = ProfileStore()
@@ -1,34 +1,17 @@
-import re
-
-from pydantic import BaseModel,validator
+from pydantic import BaseModel,field_validator
 
 from .base import *
 from .jwt import *
-from auth.validators import password_validator,username_validator
+from auth.validators import Username,Password,Email
 # from auth.jwt_auth.jwt_auth import JWTAuth
 
 
 
 
 class Signup(BaseModel):
-    username: str
-    password: str
-    email: str
-
-    @validator("username")
-    def validate_username(cls, value):
-        username_validator(value)
-        return value
-
-    @validator("password")
-    def validate_password(cls, value):
-        password_validator(value)
-        return value
-
-    @validator("email")
-    def email_validator(cls, value):
-        assert re.fullmatch(r'\w+@\w+\.\w+', value)  # [a-zA-Z]+[a-zA-Z0-9_\.\-]*@[\w]{2,}\.[a-zA-Z]{2,}
-        return value
+    username: Username
+    password: Password
+    email: Email
 
 
 
@@ -42,7 +25,7 @@ class Login(BaseModel):
 class AccessToken(BaseModel):
     token : str
 
-    @validator("token")
+    @field_validator("token")
     def token_validator(cls, value):
         splited = value.split(" ")
         assert len(splited) == 2, "prefix missing"
@@ -55,7 +38,7 @@ class AccessToken(BaseModel):
 class RefreshToken(BaseModel):
     token : str
 
-    @validator("token")
+    @field_validator("token")
     def token_validator(cls, value):
         assert len(value.split(".")) == 3, "invalid token"
         return value
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 
 from config import SETTINGS
 from schemas import Signup,Login,Result
+from profiling import traced
 
 
 
@@ -21,6 +22,7 @@ class AccountsService:
         code,resp = await self._request("v1/signup", data.model_dump())
         return resp
 
+    @traced("accounts.request")
     async def _request(self, url, data:dict) -> tuple[int, Result]:
         try:
             async with httpx.AsyncClient() as client:
@@ -1,6 +1,7 @@
 from redis import asyncio as aioredis
 
 from config.settings import SETTINGS
+from profiling import traced
 
 
 
@@ -18,6 +19,7 @@ class RedisService:
             **kwargs
         )
 
+    @traced("redis.set")
     async def set(self, key:str, value:str, ttl:int|None=None):
         await self.client.set(
             name = key,
@@ -25,15 +27,18 @@ class RedisService:
             ex = ttl or SETTINGS.REDIS_KEY_TTL
         )
 
+    @traced("redis.get")
     async def get(self, key:str):
         result = await self.client.get(key)
         return result
 
+    @traced("redis.keys")
     async def keys(self, pattern:str):
         return await self.client.keys(pattern)
 
     async def new_client(self, url):
         self.clinet = aioredis.from_url(url or SETTINGS.REDIS_URL)
 
+    @traced("redis.delete")
     async def delete(self, *keys):
         return await self.client.delete(*keys)